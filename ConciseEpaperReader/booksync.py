@@ -0,0 +1,375 @@
+import os
+import time
+import socket
+import select
+import binascii
+
+# 每次写入flash的块大小（与littlefs块大小对齐）
+CHUNK = 4096
+PART_SUFFIX = ".part"
+
+# 非阻塞连接的errno: EINPROGRESS / EAGAIN
+_IN_PROGRESS = (115, 11)
+_MAX_HEADER = 1024
+
+
+def connect_wifi(ssid, password, timeout_ms=15000):
+    """连接Wi-Fi（仅Pico W）"""
+    import network
+    wlan = network.WLAN(network.STA_IF)
+    wlan.active(True)
+    if not wlan.isconnected():
+        wlan.connect(ssid, password)
+        start = time.ticks_ms()
+        while not wlan.isconnected():
+            if time.ticks_diff(time.ticks_ms(), start) > timeout_ms:
+                print("Wi-Fi连接超时")
+                return None
+            time.sleep_ms(100)
+    print(f"Wi-Fi已连接: {wlan.ifconfig()[0]}")
+    return wlan
+
+
+def _file_size(path):
+    try:
+        return os.stat(path)[6]
+    except OSError:
+        return -1
+
+
+def valid_name(name):
+    """只接受books目录下的普通文件名，防止写到其他路径"""
+    return bool(name) and "/" not in name and "\\" not in name \
+        and ".." not in name and not name.startswith(".")
+
+
+class BookSync:
+    def __init__(self, host, port=8000, dest="books", arena=None,
+                 timeout=5, step_ms=20):
+        """
+        从局域网HTTP服务器同步书籍
+        服务器需提供 /index.txt，每行: 文件名 大小 crc32(十六进制)
+        step()使用非阻塞socket，每次最多占用step_ms毫秒
+        """
+        self.host = host
+        self.port = port
+        self.dest = dest
+        self.timeout = timeout
+        self.step_ms = step_ms
+        # 复用预分配的io缓冲区作为传输块
+        if arena is not None:
+            self._chunk = arena.view("io")
+        else:
+            self._chunk = memoryview(bytearray(CHUNK))
+
+        self._addr = None
+        self._queue = []
+        self._current = None
+        self._sock = None
+        self._poll = None
+        self._phase = None
+        self._request = b""
+        self._header = bytearray()
+        self._hbuf = memoryview(bytearray(256))
+        self._got = 0
+        self._have = 0
+        self._file = None
+        self._last_io = 0
+        self._retry_at = 0
+        self._backoff = 0
+        self.offset = 0
+        self.crc = 0
+        self.bytes_received = 0
+        self.retries = 0
+        self.failed = []
+
+        try:
+            os.mkdir(dest)
+        except OSError:
+            pass
+
+    # ---------- 清单（阻塞，仅在start时调用一次） ----------
+
+    def fetch_index(self):
+        """获取服务器上的书籍清单"""
+        if self._addr is None:
+            self._addr = socket.getaddrinfo(self.host, self.port)[0][-1]
+        sock = socket.socket()
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self._addr)
+            stream = sock.makefile("rwb", 0)
+            stream.write(f"GET /index.txt HTTP/1.0\r\nHost: {self.host}\r\n\r\n".encode())
+            status = int(stream.readline().split()[1])
+            if status != 200:
+                raise OSError(f"获取清单失败: HTTP {status}")
+            while stream.readline() not in (b"", b"\r\n"):
+                pass
+            books = []
+            while True:
+                line = stream.readline()
+                if not line:
+                    break
+                parts = line.decode().split()
+                if len(parts) == 3:
+                    books.append((parts[0], int(parts[1]), int(parts[2], 16)))
+            return books
+        finally:
+            sock.close()
+
+    def start(self):
+        """对比本地文件，排队需要下载的书籍"""
+        self._queue = []
+        self.failed = []
+        for name, size, crc in self.fetch_index():
+            if not valid_name(name):
+                print(f"拒绝非法书名: {name!r}")
+                self.failed.append(name)
+                continue
+            if _file_size(self.dest + "/" + name) != size:
+                self._queue.append((name, size, crc))
+        print(f"待同步书籍: {len(self._queue)}")
+        return len(self._queue)
+
+    # ---------- 单本书的传输状态 ----------
+
+    def _resume(self):
+        """准备续传：完整的块要重新算校验和，由_rescan分多步完成"""
+        name, size, crc = self._current
+        part = self.dest + "/" + name + PART_SUFFIX
+        self.offset = 0
+        self.crc = 0
+        have = _file_size(part)
+        # 只保留完整的块，丢弃可能写了一半的尾部
+        self._have = min(have - have % CHUNK, size) if have > 0 else 0
+        if self._have:
+            self._file = open(part, "rb")
+            print(f"续传 {name}: 从 {self._have}/{size} 字节开始")
+        else:
+            self._file = open(part, "wb")
+
+    def _rescan(self, deadline):
+        """读回.part中已有的块重算校验和，完成后切换为写入"""
+        chunk = self._chunk
+        while self.offset < self._have:
+            if time.ticks_diff(deadline, time.ticks_ms()) <= 0:
+                return
+            n = self._file.readinto(chunk[:min(len(chunk), self._have - self.offset)])
+            if not n:
+                self._have = self.offset
+                break
+            self.crc = binascii.crc32(chunk[:n], self.crc)
+            self.offset += n
+        self._file.close()
+        part = self.dest + "/" + self._current[0] + PART_SUFFIX
+        if self.offset == _file_size(part):
+            self._file = open(part, "ab")
+        else:
+            # 残缺的尾部会被下一个完整块覆盖
+            self._file = open(part, "r+b")
+            self._file.seek(self.offset)
+        self._have = 0
+
+    def _connect(self):
+        """发起非阻塞连接，之后由step()推进"""
+        name, size, crc = self._current
+        sock = socket.socket()
+        sock.setblocking(False)
+        try:
+            sock.connect(self._addr)
+        except OSError as e:
+            if e.args[0] not in _IN_PROGRESS:
+                sock.close()
+                raise
+        self._sock = sock
+        self._poll = select.poll()
+        self._poll.register(sock, select.POLLOUT)
+        self._request = (f"GET /{name} HTTP/1.0\r\nHost: {self.host}\r\n"
+                         f"Range: bytes={self.offset}-{size - 1}\r\n\r\n").encode()
+        self._header = bytearray()
+        self._got = 0
+        self._phase = "send"
+        self._last_io = time.ticks_ms()
+
+    def _close(self):
+        if self._sock is not None:
+            self._sock.close()
+        self._sock = None
+        self._poll = None
+        self._phase = None
+
+    def _recv_into(self, view):
+        # CPython用recv_into，MicroPython用readinto（无数据时返回None）
+        if hasattr(self._sock, "recv_into"):
+            return self._sock.recv_into(view)
+        n = self._sock.readinto(view)
+        return -1 if n is None else n
+
+    def _parse_header(self):
+        """头部接收完整后检查状态码，多收到的正文放进传输块"""
+        # MicroPython的bytearray没有find()，转成bytes再查找
+        header = bytes(self._header)
+        end = header.find(b"\r\n\r\n")
+        if end < 0:
+            if len(header) > _MAX_HEADER:
+                raise OSError("HTTP头部过长")
+            return
+        status = int(header[:end].split(b"\r\n")[0].split()[1])
+        body = header[end + 4:]
+        self._header = bytearray()
+        if status == 200 and self.offset:
+            # 服务器不支持Range，从头开始
+            self._file.close()
+            self._file = open(self.dest + "/" + self._current[0] + PART_SUFFIX, "wb")
+            self.offset = 0
+            self.crc = 0
+        elif status not in (200, 206):
+            raise OSError(f"下载 {self._current[0]} 失败: HTTP {status}")
+        want = min(len(self._chunk), self._current[1] - self.offset)
+        n = min(len(body), want)
+        self._chunk[:n] = body[:n]
+        self._got = n
+        self._phase = "body"
+
+    def _commit_chunk(self):
+        """写满一块后写入flash"""
+        chunk = self._chunk[:self._got]
+        self._file.write(chunk)
+        self._file.flush()
+        self.crc = binascii.crc32(chunk, self.crc)
+        self.offset += self._got
+        self.bytes_received += self._got
+        self._got = 0
+        if self.offset >= self._current[1]:
+            self._finish()
+
+    def _finish(self):
+        name, size, crc = self._current
+        self._file.close()
+        self._file = None
+        self._close()
+        part = self.dest + "/" + name + PART_SUFFIX
+        if self.crc & 0xFFFFFFFF == crc:
+            path = self.dest + "/" + name
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            os.rename(part, path)
+            print(f"同步完成: {name} ({size} 字节)")
+        else:
+            os.remove(part)
+            self.failed.append(name)
+            print(f"校验失败: {name}，已删除")
+        self._current = None
+
+    def _fail(self, e):
+        """丢弃未写满的块，退避后从文件偏移处续传"""
+        print(f"传输中断 ({self._current[0]} @ {self.offset}): {e}")
+        self._close()
+        self._got = 0
+        self.retries += 1
+        self._backoff = min(self._backoff * 2, 60000) if self._backoff else 1000
+        self._retry_at = time.ticks_add(time.ticks_ms(), self._backoff)
+
+    def _pump(self, deadline):
+        """在截止时间前尽量推进socket"""
+        while True:
+            left = time.ticks_diff(deadline, time.ticks_ms())
+            if left <= 0:
+                return
+            events = self._poll.poll(left)
+            if not events:
+                if time.ticks_diff(time.ticks_ms(), self._last_io) > self.timeout * 1000:
+                    raise OSError("连接超时")
+                return
+            flags = events[0][1]
+            if flags & (select.POLLERR | select.POLLHUP) and not flags & select.POLLIN:
+                raise OSError("连接被关闭")
+
+            if self._phase == "send":
+                n = self._sock.send(self._request)
+                self._request = self._request[n:]
+                if not self._request:
+                    self._poll.modify(self._sock, select.POLLIN)
+                    self._phase = "header"
+            else:
+                want = min(len(self._chunk), self._current[1] - self.offset)
+                if self._phase == "header":
+                    view = self._hbuf
+                else:
+                    view = self._chunk[self._got:want]
+                n = self._recv_into(view)
+                if n < 0:
+                    continue
+                if n == 0:
+                    raise OSError("连接提前关闭")
+                if self._phase == "header":
+                    self._header += view[:n]
+                    self._parse_header()
+                else:
+                    self._got += n
+                if self._phase == "body" and self._got >= want:
+                    self._commit_chunk()
+                    if self._current is None:
+                        return
+            self._last_io = time.ticks_ms()
+
+    def step(self):
+        """
+        推进同步，返回是否还有剩余任务
+        每次最多占用step_ms毫秒，可在翻页之间或屏幕BUSY等待时反复调用；
+        出错后按1s、2s、4s...（最长60s）退避重试
+        """
+        if self._current is None:
+            if not self._queue:
+                return False
+            self._current = self._queue.pop(0)
+            self._backoff = 0
+            self._resume()
+            return True
+
+        now = time.ticks_ms()
+        if self._have:
+            self._rescan(time.ticks_add(now, self.step_ms))
+            return True
+        if self.offset >= self._current[1]:
+            # .part已经完整（或空书），直接校验
+            self._finish()
+            return bool(self._queue)
+        if self._retry_at and time.ticks_diff(self._retry_at, now) > 0:
+            return True
+        try:
+            if self._sock is None:
+                self._retry_at = 0
+                self._connect()
+            before = self.offset
+            self._pump(time.ticks_add(now, self.step_ms))
+            if self.offset != before:
+                self._backoff = 0
+        except OSError as e:
+            self._fail(e)
+        return self._current is not None or bool(self._queue)
+
+    def run(self, max_retries=10):
+        """阻塞同步所有书籍，全部成功才返回True"""
+        self.start()
+        while self.step():
+            if self.retries > max_retries:
+                print("重试次数过多，停止同步")
+                self.close()
+                return False
+            if self._retry_at:
+                time.sleep_ms(50)
+        if self.failed:
+            print(f"同步失败: {', '.join(self.failed)}")
+        return not self.failed
+
+    def close(self):
+        """中止同步，保留.part文件供下次续传"""
+        self._close()
+        self._have = 0
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._current = None
@@ -0,0 +1,42 @@
+"""
+Host-side run of the SPI baud-rate calibration (run on Linux).
+
+    python3 calibhost.py [controller_max_baudrate]
+
+Runs EPDDiagnostic.calibrate_baudrate() against the controller RAM model
+in fakemachine, whose RAM writes start failing above the given rate
+(default 20 MHz).  SPI rates follow the RP2040 divider (125 MHz / even
+divisor), as in fakemachine.  Checks that the profile holds real divider
+rates, that the fastest one under the limit was verified, and that the
+selected rate is backed off by the margin.  The
+profile (panel.json) is written in a temporary directory.
+"""
+import os
+import sys
+import tempfile
+
+import fakemachine
+fakemachine.install()
+
+import panelprofile
+import epapertest3
+
+
+def calibrate(max_baudrate):
+    fakemachine.controller.max_baudrate = max_baudrate
+    os.chdir(tempfile.mkdtemp(prefix="panel-"))
+    diagnostic = epapertest3.EPDDiagnostic()
+    selected = diagnostic.calibrate_baudrate()
+    profile = panelprofile.load()
+    rates = {fakemachine.SPI_CLOCK // div for div in range(2, 65536, 2)}
+    fastest = max(b for b in epapertest3.BAUD_CANDIDATES if b <= max_baudrate)
+    assert profile["baudrate_max_verified"] == fastest, profile
+    assert profile["baudrate"] in rates and fastest in rates, profile
+    assert selected == profile["baudrate"] <= fastest * 0.75, (selected, profile)
+    assert selected == fakemachine.divided_baudrate(int(fastest * 0.75)), profile
+    print(f"controller limit {max_baudrate / 1000000:.2f} MHz -> "
+          f"selected {selected / 1000000:.2f} MHz, profile {profile}")
+
+
+if __name__ == "__main__":
+    calibrate(int(sys.argv[1]) if len(sys.argv) > 1 else 20000000)
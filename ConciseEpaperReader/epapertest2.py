@@ -1,18 +1,24 @@
 
+import os
 import machine
 import time
+from memarena import MemoryArena, fill
+from journal import ReadingJournal, open_device
+import pager
+import panelprofile
 
 class EPDDriver:
-    def __init__(self):
+    def __init__(self, arena=None, journal=None):
         # 引脚定义
         self.RST_PIN = machine.Pin(5, machine.Pin.OUT)
         self.DC_PIN = machine.Pin(6, machine.Pin.OUT)
         self.CS_PIN = machine.Pin(7, machine.Pin.OUT)
         self.BUSY_PIN = machine.Pin(8, machine.Pin.IN)
         
-        # SPI初始化
+        # SPI初始化（波特率来自校准后的屏幕配置）
+        self.profile = panelprofile.load()
         self.spi = machine.SPI(0,
-                            baudrate=4000000,
+                            baudrate=self.profile["baudrate"],
                             polarity=0,
                             phase=0,
                             bits=8,
@@ -24,6 +30,21 @@ class EPDDriver:
         self.WIDTH = 296
         self.HEIGHT = 128
         
+        # 预分配缓冲区，避免每次收发都新建bytearray
+        self.arena = arena if arena is not None else MemoryArena()
+        self._cmd_buf = bytearray(1)
+        self._data_buf = bytearray(1)
+        
+        # 阅读状态：翻页时写入日志，书按页从文件流式读取
+        self.journal = journal
+        self.books_dir = "books"
+        self.book = None
+        self.page = 0
+        self.offset = 0
+        self._book_file = None
+        self._book_size = 0
+        self._next_offset = 0
+        
     def reset(self):
         """复位屏幕"""
         self.RST_PIN.value(1)
@@ -37,7 +58,8 @@ class EPDDriver:
         """发送命令"""
         self.DC_PIN.value(0)
         self.CS_PIN.value(0)
-        self.spi.write(bytearray([command]))
+        self._cmd_buf[0] = command
+        self.spi.write(self._cmd_buf)
         self.CS_PIN.value(1)
         
     def send_data(self, data):
@@ -45,14 +67,21 @@ class EPDDriver:
         self.DC_PIN.value(1)
         self.CS_PIN.value(0)
         if isinstance(data, int):
-            self.spi.write(bytearray([data]))
+            self._data_buf[0] = data
+            self.spi.write(self._data_buf)
         else:
             self.spi.write(data)
         self.CS_PIN.value(1)
         
     def wait_until_idle(self):
         """等待屏幕空闲"""
+        collected = False
         while self.BUSY_PIN.value() == 0:
+            # 屏幕刷新期间CPU空闲，趁机做一次GC
+            if not collected:
+                self.arena.collect()
+                collected = True
+                continue
             time.sleep_ms(10)
             
     def init_display(self):
@@ -68,28 +97,128 @@ class EPDDriver:
         
     def clear_screen(self):
         """清屏"""
-        self.send_command(0x10)
-        for i in range(self.WIDTH * self.HEIGHT // 8):
-            self.send_data(0xFF)
+        frame = self.arena.view("frame_bw")
+        self.arena.pause_gc()
+        try:
+            fill(frame, 0xFF)
+            self.send_command(0x10)
+            self.send_data(frame)
             
-        self.send_command(0x13)
-        for i in range(self.WIDTH * self.HEIGHT // 8):
-            self.send_data(0x00)
+            fill(frame, 0x00)
+            self.send_command(0x13)
+            self.send_data(frame)
+        finally:
+            self.arena.resume_gc()
             
         self.send_command(0x12)  # 刷新显示
         self.wait_until_idle()
         
+    def display_frame(self, black, red=None):
+        """把帧缓冲写入控制器RAM并刷新（0x24黑白，0x26红色）"""
+        if red is None:
+            red = self.arena.view("frame_red")
+            fill(red, 0x00)
+        
+        self.arena.pause_gc()
+        try:
+            for cmd, frame in ((0x24, black), (0x26, red)):
+                self.send_command(0x4E)  # RAM X地址计数器
+                self.send_data(0x00)
+                self.send_command(0x4F)  # RAM Y地址计数器
+                self.send_data(0x00)
+                self.send_data(0x00)
+                self.send_command(cmd)
+                self.send_data(frame)
+        finally:
+            self.arena.resume_gc()
+        
+        self.send_command(0x22)  # 显示更新序列
+        self.send_data(0xF7)
+        self.send_command(0x20)  # 激活刷新
+        self.wait_until_idle()
+        
+    def display_page(self, lines, footer=None):
+        """显示一页文字"""
+        frame = self.arena.view("frame_bw")
+        pager.render_page(frame, lines, footer)
+        self.display_frame(frame)
+        
     def display_text(self, text, x=0, y=0):
-        """显示文本（基础功能）"""
-        # 这里需要实现字符渲染逻辑
-        print(f"Display text: {text} at ({x}, {y})")
+        """显示文本（x、y为像素坐标，按字符格对齐）"""
+        frame = self.arena.view("frame_bw")
+        fill(frame, 0xFF)
+        pager.draw_text(frame, text, x // pager.CHAR_W, y // pager.LINE_H)
+        self.display_frame(frame)
+        
+    def open_book(self, name):
+        """打开书籍文件（不读入内存），并记入阅读日志"""
+        path = self.books_dir + "/" + name
+        size = os.stat(path)[6]
+        f = open(path, "rb")
+        if self._book_file is not None:
+            self._book_file.close()
+        self._book_file = f
+        self._book_size = size
+        self.book = name
+        self.page = 0
+        self.offset = 0
+        self._next_offset = 0
+        if self.journal is not None:
+            self.journal.open_book(name)
+            
+    def show_page(self, page, offset):
+        """从字节偏移处排版并显示一页，然后把页码和偏移写入日志"""
+        if offset >= self._book_size:
+            # 书被替换或变短了，回到开头
+            page = offset = 0
+        lines, next_offset = pager.read_page(self._book_file, offset,
+                                             self.arena.view("text"))
+        percent = next_offset * 100 // self._book_size if self._book_size else 100
+        self.display_page(lines, f"{page + 1} {percent}%")
+        self.page = page
+        self.offset = offset
+        self._next_offset = next_offset
+        if self.journal is not None:
+            self.journal.set_page(page, offset)
+            
+    def next_page(self):
+        """翻到下一页，已是最后一页时返回False"""
+        if self._next_offset >= self._book_size or self._next_offset <= self.offset:
+            return False
+        self.show_page(self.page + 1, self._next_offset)
+        return True
 
 # 主程序
 def main():
-    epd = EPDDriver()
+    arena = MemoryArena()
+    journal = ReadingJournal(open_device("reader.jnl"), arena)
+    epd = EPDDriver(arena, journal)
     epd.init_display()
-    epd.clear_screen()
-    epd.display_text("Hello E-Paper!")
+    
+    # 从日志恢复阅读状态，直接从上次的页首偏移处排版
+    state = journal.replay()
+    journal.stats()
+    # 上次的书打不开（被删除或改名）时，依次尝试books目录里的其他书
+    try:
+        names = sorted(n for n in os.listdir(epd.books_dir) if n.endswith(".txt"))
+    except OSError:
+        names = []
+    books = [state.book] if state.book else []
+    books += [n for n in names if n != state.book]
+    for book in books:
+        try:
+            epd.open_book(book)
+            if book == state.book:
+                epd.show_page(state.page, state.offset)
+            else:
+                epd.show_page(0, 0)
+            break
+        except (OSError, MemoryError) as e:
+            print(f"无法打开 {book}: {e}")
+    else:
+        epd.clear_screen()
+        epd.display_text("Hello E-Paper!")
+    epd.arena.diagnostics()
     
 if __name__ == "__main__":
     main()
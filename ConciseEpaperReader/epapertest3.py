@@ -2,6 +2,13 @@
 import machine
 import time
 import sys
+import panelprofile
+
+# The RP2040 SPI clock is clk_peri (125 MHz) divided by an even number,
+# so only these rates exist; candidates are 125 MHz / 32 ... / 4, slowest first
+SPI_CLOCK = 125000000
+BAUD_CANDIDATES = tuple(SPI_CLOCK // div for div in range(32, 2, -2))
+DEFAULT_BAUDRATE = 4000000
 
 class EPDDiagnostic:
     def __init__(self):
@@ -16,23 +23,40 @@ class EPDDiagnostic:
         self.DC_PIN.value(0)
         self.CS_PIN.value(1)
         
+        self.WIDTH = 296
+        self.HEIGHT = 128
+        
         # SPI initialization
         try:
-            self.spi = machine.SPI(0,
-                                baudrate=4000000,
-                                polarity=0,
-                                phase=0,
-                                bits=8,
-                                firstbit=machine.SPI.MSB,
-                                sck=machine.Pin(2),
-                                mosi=machine.Pin(3))
+            self._init_spi(DEFAULT_BAUDRATE)
             print("✓ SPI initialization successful")
         except Exception as e:
             print(f"✗ SPI initialization failed: {e}")
             return
         
-        self.WIDTH = 296
-        self.HEIGHT = 128
+    def _init_spi(self, baudrate):
+        """(Re)initialize SPI at the given rate; self.baudrate is the rate actually set"""
+        self.spi = machine.SPI(0,
+                            baudrate=baudrate,
+                            polarity=0,
+                            phase=0,
+                            bits=8,
+                            firstbit=machine.SPI.MSB,
+                            sck=machine.Pin(2),
+                            mosi=machine.Pin(3))
+        self.baudrate = self.actual_baudrate(baudrate)
+        
+    def actual_baudrate(self, requested):
+        """Rate the SPI block really runs at, read back from repr(spi)"""
+        text = str(self.spi)
+        start = text.find("baudrate=")
+        if start < 0:
+            return requested
+        start += len("baudrate=")
+        end = start
+        while end < len(text) and text[end].isdigit():
+            end += 1
+        return int(text[start:end])
         
     def test_pins(self):
         """Test all GPIO pins"""
@@ -173,7 +197,154 @@ class EPDDiagnostic:
         
         self.send_command(0x20)  # Activate display
         print("✓ Display testing completed")
-    
+
+    def wait_until_idle(self, timeout=5000):
+        """Wait for BUSY to release, False on timeout"""
+        start = time.ticks_ms()
+        while self.BUSY_PIN.value() == 0:
+            if time.ticks_diff(time.ticks_ms(), start) > timeout:
+                return False
+            time.sleep_ms(10)
+        return True
+
+    def _set_ram_window(self):
+        """Full-screen RAM window with X/Y increment, counters at 0"""
+        for cmd, data in ((0x11, (0x03,)),
+                          (0x44, (0x00, 0x0F)),
+                          (0x45, (0x00, 0x00, 0x27, 0x01)),
+                          (0x4E, (0x00,)),
+                          (0x4F, (0x00, 0x00))):
+            self.send_command(cmd)
+            for d in data:
+                self.send_data(d)
+
+    def _test_patterns(self, length=256):
+        """Solid, alternating, walking-bit and pseudo-random patterns"""
+        patterns = [bytearray(bytes([v]) * length) for v in (0x00, 0xFF, 0xAA, 0x55)]
+        walk = bytearray(length)
+        rand = bytearray(length)
+        x = 0xACE1
+        for i in range(length):
+            walk[i] = 1 << (i % 8)
+            # 16-bit Galois LFSR
+            x = (x >> 1) ^ (0xB400 if x & 1 else 0)
+            rand[i] = x & 0xFF
+        patterns.append(walk)
+        patterns.append(rand)
+        return patterns
+
+    def read_ram(self, buf):
+        """
+        Read back black/white RAM (0x27) over the 3-wire bidirectional SDA line.
+        SDA (GP3) is SPI0 TX only, so SPI is released and the read is bit-banged
+        at a low, known-good rate; only the writes run at the rate under test.
+        """
+        self.send_command(0x41)  # Read RAM option: black/white RAM
+        self.send_data(0x00)
+        self.send_command(0x4E)
+        self.send_data(0x00)
+        self.send_command(0x4F)
+        self.send_data(0x00)
+        self.send_data(0x00)
+        self.send_command(0x27)  # Read RAM
+
+        self.spi.deinit()
+        sck = machine.Pin(2, machine.Pin.OUT, value=0)
+        sda = machine.Pin(3, machine.Pin.IN)
+        self.DC_PIN.value(1)
+        self.CS_PIN.value(0)
+        try:
+            # The first byte clocked out after 0x27 is a dummy
+            for i in range(-1, len(buf)):
+                value = 0
+                for bit in range(8):
+                    sck.value(1)
+                    value = (value << 1) | sda.value()
+                    sck.value(0)
+                if i >= 0:
+                    buf[i] = value
+        finally:
+            self.CS_PIN.value(1)
+            self._init_spi(self.baudrate)
+
+    def verify_baudrate(self, baudrate, patterns, trials=3):
+        """Write each pattern at baudrate, read it back and compare"""
+        readback = bytearray(len(patterns[0]))
+        for trial in range(trials):
+            for pattern in patterns:
+                self._init_spi(baudrate)
+                self._set_ram_window()
+                self.send_command(0x24)
+                self.send_data(pattern)
+                self.read_ram(readback)
+                if readback != pattern:
+                    return False
+        return True
+
+    def measure_frame_time(self, baudrate):
+        """Time one full-frame RAM write (us) at baudrate"""
+        frame = bytearray(self.WIDTH * self.HEIGHT // 8)
+        self._init_spi(baudrate)
+        self._set_ram_window()
+        start = time.ticks_us()
+        self.send_command(0x24)
+        self.send_data(frame)
+        return time.ticks_diff(time.ticks_us(), start)
+
+    def calibrate_baudrate(self, margin=0.75, trials=3):
+        """
+        Find the fastest SPI rate whose RAM writes read back intact, then back
+        off by margin and store the result in the panel profile
+        """
+        print("\n=== SPI Baud Rate Calibration ===")
+        self.hard_reset()
+        self._init_spi(DEFAULT_BAUDRATE)
+        self.send_command(0x12)  # SWRESET
+        time.sleep_ms(10)
+        if not self.wait_until_idle():
+            print("✗ Screen not responding, calibration skipped")
+            return None
+
+        patterns = self._test_patterns()
+        fastest = None
+        for baudrate in BAUD_CANDIDATES:
+            ok = self.verify_baudrate(baudrate, patterns, trials)
+            # Judge and report the rate the divider produced, not the request
+            actual = self.baudrate
+            print(f"{'✓' if ok else '✗'} {actual / 1000000:.2f} MHz")
+            if not ok:
+                break
+            fastest = actual
+
+        if fastest is None:
+            print("✗ RAM readback failed even at the slowest rate, check SDA wiring")
+            self._init_spi(DEFAULT_BAUDRATE)
+            return None
+
+        # Safety margin: the divider rounds down, so the rate actually set for
+        # margin * fastest is never above it (also when only the slowest passed)
+        self._init_spi(int(fastest * margin))
+        selected = self.baudrate
+
+        profile = panelprofile.load()
+        profile["baudrate"] = selected
+        profile["baudrate_max_verified"] = fastest
+        panelprofile.save(profile)
+
+        default_us = self.measure_frame_time(DEFAULT_BAUDRATE)
+        default_rate = self.baudrate
+        selected_us = self.measure_frame_time(selected)
+        self._init_spi(selected)
+        print(f"✓ Fastest verified: {fastest / 1000000:.2f} MHz, "
+              f"selected {selected / 1000000:.2f} MHz "
+              f"({selected * 100 // fastest}%, saved to {panelprofile.PROFILE_PATH})")
+        bits = self.WIDTH * self.HEIGHT
+        print(f"Full-frame transfer: {default_us}us at {default_rate / 1000000:.2f} MHz "
+              f"(wire {bits * 1000000 // default_rate}us), "
+              f"{selected_us}us at {selected / 1000000:.2f} MHz "
+              f"(wire {bits * 1000000 // selected}us)")
+        return selected
+
     def run_full_diagnostic(self):
         """Run complete diagnostic"""
         print("Starting E-paper Diagnostic...")
@@ -203,6 +374,9 @@ class EPDDiagnostic:
         # 7. Display testing
         self.test_display_pattern()
         
+        # 8. SPI baud rate calibration
+        self.calibrate_baudrate()
+        
         print("\n" + "=" * 50)
         print("Diagnostic completed!")
         return True
@@ -0,0 +1,196 @@
+"""
+Host-side stand-in for MicroPython's `machine` module.
+
+install() puts this module into sys.modules as `machine` and adds the
+MicroPython-only helpers (sleep_ms, ticks_ms, ticks_us, ticks_diff) to
+`time`, so the device drivers run unchanged under CPython.  Every SPI
+write is logged together with the level of the DC pin, and
+decode_ram() turns that log back into controller RAM contents.
+
+`controller` models the black/white RAM of the panel controller: RAM
+address counters (0x4E/0x4F), RAM writes (0x24) and Read RAM (0x27),
+whose output is clocked out bit by bit on the SDA pin once it is
+switched to input, as on the real 3-wire bus.  Writes faster than
+controller.max_baudrate get bit errors, so baud-rate calibration has a
+limit to find.
+"""
+import sys
+import time
+
+DC_PIN = 6
+SDA_PIN = 3
+SPI_CLOCK = 125000000  # clk_peri on the RP2040
+
+_pins = {}
+bus_log = []
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+
+    def __init__(self, id, mode=IN, value=None):
+        self.id = id
+        self.mode = mode
+        # BUSY reads as idle (1) so waits return immediately
+        self._value = 1 if value is None else value
+        _pins[id] = self
+
+    def value(self, v=None):
+        if v is None:
+            if self.id == SDA_PIN and self.mode == Pin.IN and controller.reading:
+                return controller.read_bit()
+            return self._value
+        self._value = v
+
+    def on(self):
+        self._value = 1
+
+    def off(self):
+        self._value = 0
+
+    def toggle(self):
+        self._value ^= 1
+
+
+def divided_baudrate(baudrate):
+    """The rate the RP2040 SPI divider really produces (pico-sdk spi_set_baudrate)."""
+    prescale = 2
+    while prescale < 254 and SPI_CLOCK >= (prescale + 2) * 256 * baudrate:
+        prescale += 2
+    postdiv = 256
+    while postdiv > 1 and SPI_CLOCK // (prescale * (postdiv - 1)) <= baudrate:
+        postdiv -= 1
+    return SPI_CLOCK // (prescale * postdiv)
+
+
+class SPI:
+    MSB = 0
+    LSB = 1
+
+    def __init__(self, id, baudrate=1000000, **kwargs):
+        self.id = id
+        self.baudrate = divided_baudrate(baudrate)
+        self.bytes_written = 0
+
+    def __repr__(self):
+        return (f"SPI({self.id}, baudrate={self.baudrate}, polarity=0, phase=0, "
+                f"bits=8, sck=2, mosi=3, miso=4)")
+
+    def init(self, baudrate=None, **kwargs):
+        if baudrate is not None:
+            self.baudrate = divided_baudrate(baudrate)
+
+    def deinit(self):
+        pass
+
+    def write(self, buf):
+        dc = _pins[DC_PIN].value() if DC_PIN in _pins else 1
+        bus_log.append((dc, bytes(buf)))
+        self.bytes_written += len(buf)
+        controller.feed(dc, buf, self.baudrate)
+
+
+class ADC:
+    def __init__(self, pin):
+        self.pin = pin
+
+    def read_u16(self):
+        return 65535
+
+
+class Controller:
+    RAM_ROWS = 296
+    ROW_BYTES = 16
+
+    def __init__(self, max_baudrate=20000000):
+        self.max_baudrate = max_baudrate
+        self.ram = bytearray(b"\xff" * (self.RAM_ROWS * self.ROW_BYTES))
+        self.reset()
+
+    def reset(self):
+        self.x = 0
+        self.y = 0
+        self.command = None
+        self.args = bytearray()
+        self.reading = False
+        self._bits = None
+
+    def _address(self):
+        return (self.y % self.RAM_ROWS) * self.ROW_BYTES + self.x % self.ROW_BYTES
+
+    def _advance(self):
+        # data entry mode 0x03: X increments, then Y at the end of a row
+        self.x += 1
+        if self.x >= self.ROW_BYTES:
+            self.x = 0
+            self.y += 1
+
+    def feed(self, dc, data, baudrate):
+        if dc == 0:
+            self.command = data[0]
+            self.args = bytearray()
+            self.reading = False
+            if self.command == 0x12:
+                self.reset()
+            elif self.command == 0x27:
+                self.reading = True
+                self._bits = self._read_bits()
+            return
+        for value in data:
+            if self.command == 0x24:
+                if baudrate > self.max_baudrate and self._address() % 7 == 3:
+                    value ^= 0x10  # overclocked write: a bit flips
+                self.ram[self._address()] = value
+                self._advance()
+            elif self.command == 0x4E:
+                self.x = value
+            elif self.command == 0x4F:
+                self.args.append(value)
+                self.y = self.args[0] | (self.args[1] << 8 if len(self.args) > 1 else 0)
+
+    def _read_bits(self):
+        # Read RAM clocks out one dummy byte, then RAM from the counters
+        for bit in range(8):
+            yield 0
+        while True:
+            value = self.ram[self._address()]
+            self._advance()
+            for bit in range(7, -1, -1):
+                yield (value >> bit) & 1
+
+    def read_bit(self):
+        return next(self._bits)
+
+
+controller = Controller()
+
+
+def decode_ram(log=None):
+    """Collect the data written after each RAM write command (0x24 / 0x26)."""
+    ram = {}
+    current = None
+    for dc, data in bus_log if log is None else log:
+        if dc == 0:
+            current = data[0] if data[0] in (0x24, 0x26) else None
+            if current is not None:
+                ram[current] = bytearray()
+        elif current is not None:
+            ram[current] += data
+    return ram
+
+
+def reset():
+    bus_log.clear()
+    controller.reset()
+
+
+def install():
+    sys.modules["machine"] = sys.modules[__name__]
+    if not hasattr(time, "sleep_ms"):
+        time.sleep_ms = lambda ms: time.sleep(ms / 1000)
+        time.sleep_us = lambda us: time.sleep(us / 1000000)
+        time.ticks_ms = lambda: time.perf_counter_ns() // 1000000
+        time.ticks_us = lambda: time.perf_counter_ns() // 1000
+        time.ticks_add = lambda t, delta: t + delta
+        time.ticks_diff = lambda a, b: a - b
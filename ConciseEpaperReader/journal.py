@@ -0,0 +1,434 @@
+import os
+import time
+import struct
+import binascii
+
+# 记录格式: 魔数, 类型, 保留, 序号, 20字节负载, crc32 (共32字节)
+RECORD = "<BBHI20sI"
+RECORD_SIZE = 32
+MAGIC = 0xA5
+
+T_NAME = 1        # 书名片段: id, 序号, 15字节
+T_OPEN = 2        # 打开书: id
+T_PAGE = 3        # 页码: id, 页, 页首字节偏移
+T_MARK = 4        # 添加书签: id, 页
+T_UNMARK = 5      # 删除书签: id, 页
+T_SET = 6         # 设置: 16字节键, 整数值
+T_SNAP_BEGIN = 7  # 快照开始
+T_SNAP_END = 8    # 快照结束: 开始记录的序号
+
+NAME_CHUNK = 15
+
+# 日志区大小（块），块大小由设备决定（rp2.Flash为4096）
+JOURNAL_BLOCKS = 8
+
+
+def _is_erased(buf, offset):
+    for i in range(offset, offset + RECORD_SIZE):
+        if buf[i] != 0xFF:
+            return False
+    return True
+
+
+def book_id(name):
+    return binascii.crc32(name.encode()) & 0xFFFFFFFF
+
+
+def flash_region(blocks=JOURNAL_BLOCKS):
+    """
+    flash存储区末尾blocks块的原始块设备（rp2.Flash），文件系统没有占用
+    这段空间时才返回，否则返回None
+    固件默认把整个存储区交给littlefs；预留日志区需要固件的_boot.py改为
+    用 rp2.Flash(len=存储区长度 - blocks * 4096) 格式化并挂载文件系统
+    """
+    try:
+        import rp2
+    except ImportError:
+        return None
+    flash = rp2.Flash()
+    block_size = flash.ioctl(5, 0)
+    length = blocks * block_size
+    start = flash.ioctl(4, 0) * block_size - length
+    # 文件系统从存储区开头起，占用 f_frsize * f_blocks 字节
+    st = os.statvfs("/")
+    if st[1] * st[2] > start:
+        return None
+    return rp2.Flash(start=start, len=length)
+
+
+def open_device(path="reader.jnl", blocks=JOURNAL_BLOCKS):
+    """优先使用预留的原始flash；没有预留时退回文件（后备）"""
+    dev = flash_region(blocks)
+    if dev is not None:
+        print(f"阅读日志: 原始flash, {blocks} 块")
+        return dev
+    print("阅读日志: flash末尾没有预留日志区，使用文件后备 " + path)
+    return FileBlockDev(path, blocks=blocks)
+
+
+class FileBlockDev:
+    """
+    后备方案：用预分配文件模拟的块设备（MicroPython扩展块协议）
+    文件在littlefs上是写时复制的，每次32字节写入加flush都可能让文件系统
+    复制并擦除整个4KB块，日志的写放大优势在这里不成立；只在没有预留
+    原始flash（见flash_region）时使用
+    """
+
+    # stats()据此提示统计数字不含文件系统的开销
+    on_filesystem = True
+
+    def __init__(self, path, block_size=4096, blocks=JOURNAL_BLOCKS):
+        self.block_size = block_size
+        self.blocks = blocks
+        size = block_size * blocks
+        try:
+            exists = os.stat(path)[6] == size
+        except OSError:
+            exists = False
+        if not exists:
+            with open(path, "wb") as f:
+                erased = b"\xff" * 256
+                for i in range(size // 256):
+                    f.write(erased)
+        self._file = open(path, "r+b")
+
+    def readblocks(self, block, buf, offset=0):
+        self._file.seek(block * self.block_size + offset)
+        self._file.readinto(buf)
+
+    def writeblocks(self, block, buf, offset=0):
+        self._file.seek(block * self.block_size + offset)
+        self._file.write(buf)
+        self._file.flush()
+
+    def ioctl(self, op, arg):
+        if op == 4:  # 块数量
+            return self.blocks
+        if op == 5:  # 块大小
+            return self.block_size
+        if op == 6:  # 擦除块
+            erased = b"\xff" * 256
+            self._file.seek(arg * self.block_size)
+            for i in range(self.block_size // 256):
+                self._file.write(erased)
+            self._file.flush()
+            return 0
+        return None
+
+
+class ReadingState:
+    def __init__(self):
+        self.names = {}      # id -> 书名(utf-8字节)
+        self.current = None  # 当前书id
+        self.pages = {}      # id -> 页码
+        self.offsets = {}    # id -> 页首在文件中的字节偏移
+        self.marks = {}      # id -> 书签页码列表
+        self.settings = {}
+
+    @property
+    def book(self):
+        name = self.names.get(self.current)
+        return name.decode() if name is not None else None
+
+    @property
+    def page(self):
+        return self.pages.get(self.current, 0)
+
+    @property
+    def offset(self):
+        return self.offsets.get(self.current, 0)
+
+    def bookmarks(self, name=None):
+        bid = self.current if name is None else book_id(name)
+        return sorted(self.marks.get(bid, ()))
+
+    def apply(self, rtype, payload):
+        if rtype == T_NAME:
+            bid, idx, chunk = struct.unpack("<IB15s", payload)
+            raw = self.names.get(bid, b"") if idx else b""
+            self.names[bid] = raw[:idx * NAME_CHUNK] + chunk.rstrip(b"\x00")
+        elif rtype == T_OPEN:
+            self.current = struct.unpack("<I", payload[:4])[0]
+        elif rtype == T_PAGE:
+            bid, page, offset = struct.unpack("<III", payload[:12])
+            self.pages[bid] = page
+            self.offsets[bid] = offset
+        elif rtype == T_MARK:
+            bid, page = struct.unpack("<II", payload[:8])
+            marks = self.marks.setdefault(bid, [])
+            if page not in marks:
+                marks.append(page)
+        elif rtype == T_UNMARK:
+            bid, page = struct.unpack("<II", payload[:8])
+            marks = self.marks.get(bid)
+            if marks and page in marks:
+                marks.remove(page)
+        elif rtype == T_SET:
+            key, value = struct.unpack("<16si", payload)
+            self.settings[key.rstrip(b"\x00").decode()] = value
+
+
+class ReadingJournal:
+    def __init__(self, dev, arena=None):
+        """
+        追加写的阅读状态日志
+        记录按32字节定长写入，块写满后轮换到下一块；
+        轮换即将覆盖最老的有效数据时，先在新块开头写一份完整快照
+        dev为任何支持扩展块协议的设备；只有原始flash分区才能保证
+        一条记录只编程32字节，FileBlockDev受littlefs写时复制限制
+        """
+        self.dev = dev
+        self.block_size = dev.ioctl(5, 0)
+        self.blocks = dev.ioctl(4, 0)
+        self.slots = self.block_size // RECORD_SIZE
+        if self.blocks < 3:
+            raise ValueError("日志区至少需要3个块")
+        if arena is not None:
+            self._block = arena.scratch(self.block_size, "io")
+        else:
+            self._block = memoryview(bytearray(self.block_size))
+        self._rec = bytearray(RECORD_SIZE)
+
+        self.state = ReadingState()
+        self.head = 0
+        self.slot = 0
+        self.seq = 1
+        self.live_start = 0
+
+        # 统计
+        self.user_records = 0
+        self.snapshot_records = 0
+        self.bytes_programmed = 0
+        self.erases = 0
+        self.compactions = 0
+        self.boot_bytes_read = 0
+        self.boot_records = 0
+        self.boot_us = 0
+
+    # ---------- 启动恢复 ----------
+
+    def _parse(self, buf, slot):
+        rec = buf[slot * RECORD_SIZE:(slot + 1) * RECORD_SIZE]
+        magic, rtype, _, seq, payload, crc = struct.unpack(RECORD, rec)
+        if magic != MAGIC or binascii.crc32(rec[:28]) & 0xFFFFFFFF != crc:
+            return None
+        return rtype, seq, payload
+
+    def replay(self):
+        """顺序读取整个日志区，恢复阅读状态"""
+        start = time.ticks_us()
+        self.boot_bytes_read = 0
+        self.boot_records = 0
+
+        # 每块只读第一条记录，确定块的先后顺序
+        first = []
+        head = self._rec
+        for block in range(self.blocks):
+            self.dev.readblocks(block, head, 0)
+            self.boot_bytes_read += RECORD_SIZE
+            rec = self._parse(head, 0)
+            if rec:
+                first.append((rec[1], block))
+        first.sort()
+
+        if not first:
+            # 空日志区（或无法识别的内容）：只擦除不是全空的块，
+            # 全新的日志区不产生任何擦除
+            buf = self._block
+            for block in range(self.blocks):
+                self.dev.readblocks(block, buf, 0)
+                self.boot_bytes_read += self.block_size
+                for slot in range(self.slots):
+                    if not _is_erased(buf, slot * RECORD_SIZE):
+                        self._erase(block)
+                        break
+            self.state = ReadingState()
+            self.head = self.slot = self.live_start = 0
+            self.seq = 1
+            self.boot_us = time.ticks_diff(time.ticks_us(), start)
+            return self.state
+
+        state = ReadingState()
+        snap = None
+        snap_block = None
+        live_start = first[0][1]
+        buf = self._block
+        for _, block in first:
+            self.dev.readblocks(block, buf, 0)
+            self.boot_bytes_read += self.block_size
+            used = 0
+            for slot in range(self.slots):
+                if _is_erased(buf, slot * RECORD_SIZE):
+                    continue
+                used = slot + 1
+                rec = self._parse(buf, slot)
+                if rec is None:
+                    continue
+                rtype, seq, payload = rec
+                self.boot_records += 1
+                self.seq = seq + 1
+                if rtype == T_SNAP_BEGIN:
+                    snap = ReadingState()
+                    snap_seq = seq
+                    snap_block = block
+                elif rtype == T_SNAP_END:
+                    if snap is not None and struct.unpack("<I", payload[:4])[0] == snap_seq:
+                        state = snap
+                        live_start = snap_block
+                    snap = None
+                else:
+                    # 快照未完成时两边都应用，快照残缺就退回旧状态
+                    state.apply(rtype, payload)
+                    if snap is not None:
+                        snap.apply(rtype, payload)
+            self.head = block
+            self.slot = used
+
+        self.state = state
+        self.live_start = live_start
+        if self.slot >= self.slots:
+            self._advance()
+        elif self._free_ahead() <= self._snapshot_blocks():
+            # 上次快照写到一半断电，剩余空块不够了，马上补一份快照
+            self._compact()
+        self.boot_us = time.ticks_diff(time.ticks_us(), start)
+        return state
+
+    # ---------- 写入 ----------
+
+    def _erase(self, block):
+        self.dev.ioctl(6, block)
+        self.erases += 1
+
+    def _program(self, rtype, payload):
+        rec = self._rec
+        struct.pack_into(RECORD, rec, 0, MAGIC, rtype, 0, self.seq, payload, 0)
+        struct.pack_into("<I", rec, 28, binascii.crc32(memoryview(rec)[:28]) & 0xFFFFFFFF)
+        self.dev.writeblocks(self.head, rec, self.slot * RECORD_SIZE)
+        self.bytes_programmed += RECORD_SIZE
+        self.seq += 1
+        self.slot += 1
+
+    def _free_ahead(self):
+        """head之后、最老有效块之前的空块数"""
+        return (self.live_start - self.head - 1) % self.blocks
+
+    def _snapshot_blocks(self):
+        n = len(self._snapshot_records())
+        return (n + self.slots - 1) // self.slots
+
+    def _next_block(self):
+        self.head = (self.head + 1) % self.blocks
+        self.slot = 0
+        self._erase(self.head)
+
+    def _advance(self):
+        """
+        切换到下一块；空块只剩快照所需的数量时先写快照
+        每块最多让快照多占一块，所以提前一块触发总能放得下
+        """
+        self._next_block()
+        if self._free_ahead() <= self._snapshot_blocks():
+            self._compact()
+
+    def _compact(self):
+        records = self._snapshot_records()
+        room = (self._free_ahead() + 1) * self.slots - self.slot
+        if len(records) > room:
+            raise ValueError("阅读状态过大，日志区放不下快照")
+        begin = self.seq
+        start = self.head
+        for rtype, payload in records:
+            if rtype == T_SNAP_END:
+                payload = struct.pack("<I", begin)
+            if self.slot >= self.slots:
+                self._next_block()
+            self._program(rtype, payload)
+        self.snapshot_records += len(records)
+        self.compactions += 1
+        self.live_start = start
+
+    def _snapshot_records(self):
+        s = self.state
+        records = [(T_SNAP_BEGIN, b"")]
+        books = set(s.names) | set(s.pages) | set(s.marks)
+        for bid in sorted(books):
+            if bid in s.names:
+                records += self._name_records(bid, s.names[bid])
+            if bid in s.pages:
+                records.append((T_PAGE, struct.pack("<III", bid, s.pages[bid],
+                                                    s.offsets.get(bid, 0))))
+            for page in s.marks.get(bid, ()):
+                records.append((T_MARK, struct.pack("<II", bid, page)))
+        for key, value in s.settings.items():
+            records.append((T_SET, struct.pack("<16si", key.encode(), value)))
+        if s.current is not None:
+            records.append((T_OPEN, struct.pack("<I", s.current)))
+        records.append((T_SNAP_END, b""))
+        return records
+
+    @staticmethod
+    def _name_records(bid, name):
+        raw = name
+        records = []
+        for idx in range(max(1, (len(raw) + NAME_CHUNK - 1) // NAME_CHUNK)):
+            chunk = raw[idx * NAME_CHUNK:(idx + 1) * NAME_CHUNK]
+            records.append((T_NAME, struct.pack("<IB15s", bid, idx, chunk)))
+        return records
+
+    def _append(self, rtype, payload):
+        if self.slot >= self.slots:
+            self._advance()
+        self._program(rtype, payload)
+        self.user_records += 1
+        self.state.apply(rtype, payload)
+
+    def open_book(self, name):
+        bid = book_id(name)
+        raw = name.encode()
+        if self.state.names.get(bid) != raw:
+            for rtype, payload in self._name_records(bid, raw):
+                self._append(rtype, payload)
+        self._append(T_OPEN, struct.pack("<I", bid))
+
+    def set_page(self, page, offset=0):
+        """记录当前页码和页首的字节偏移（恢复时从偏移处直接排版）"""
+        if self.state.current is None:
+            raise ValueError("没有打开的书")
+        if self.state.page != page or self.state.offset != offset:
+            self._append(T_PAGE, struct.pack("<III", self.state.current, page, offset))
+
+    def add_bookmark(self, page):
+        self._append(T_MARK, struct.pack("<II", self.state.current, page))
+
+    def remove_bookmark(self, page):
+        self._append(T_UNMARK, struct.pack("<II", self.state.current, page))
+
+    def set_setting(self, key, value):
+        if len(key.encode()) > 16:
+            raise ValueError(f"设置名过长: {key}")
+        self._append(T_SET, struct.pack("<16si", key.encode(), value))
+
+    def stats(self, verbose=True):
+        """汇报写放大和启动恢复开销"""
+        logical = self.user_records * RECORD_SIZE
+        info = {
+            "user_records": self.user_records,
+            "snapshot_records": self.snapshot_records,
+            "compactions": self.compactions,
+            "bytes_programmed": self.bytes_programmed,
+            "erases": self.erases,
+            "write_amplification": self.bytes_programmed / logical if logical else 0.0,
+            "boot_bytes_read": self.boot_bytes_read,
+            "boot_records": self.boot_records,
+            "boot_us": self.boot_us,
+        }
+        if verbose:
+            print("=== 阅读日志 ===")
+            print(f"记录: {info['user_records']} 条, 快照 {info['compactions']} 次 ({info['snapshot_records']} 条)")
+            print(f"写入 {info['bytes_programmed']} 字节, 擦除 {info['erases']} 次, 写放大 {info['write_amplification']:.3f}")
+            print(f"启动恢复: 读取 {info['boot_bytes_read']} 字节, {info['boot_records']} 条记录, {info['boot_us']}us")
+            if getattr(self.dev, "on_filesystem", False):
+                print("注意: 日志使用文件后备（littlefs），以上为逻辑统计，"
+                      "每条记录实际还会引起整块复制和擦除")
+        return info
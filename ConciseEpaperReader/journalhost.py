@@ -0,0 +1,134 @@
+"""
+Host-side check and benchmark for the reading-state journal (run on Linux).
+
+    python3 journalhost.py [page_turns]
+
+Simulates a long reading session (page turns, bookmarks, settings, book
+switches) with random power cuts, replays the journal after every cut
+and checks the recovered state against a reference model.  Reports
+write amplification, per-block erase spread, the cost of the naive
+"rewrite a JSON file on every page turn" approach, and boot-time replay
+cost.  The figures hold for a raw flash region (journal.flash_region(),
+what main() uses when the firmware reserves one).  The FileBlockDev
+fallback sits on littlefs on the Pico, whose copy-on-write adds a block
+copy and erase per record that is not counted here.
+"""
+import os
+import sys
+import json
+import random
+import tempfile
+
+import fakemachine
+fakemachine.install()
+
+from journal import FileBlockDev, ReadingJournal, RECORD_SIZE
+
+
+class CountingBlockDev(FileBlockDev):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.block_erases = [0] * self.blocks
+
+    def ioctl(self, op, arg):
+        if op == 6:
+            self.block_erases[arg] += 1
+        return super().ioctl(op, arg)
+
+
+def bench(turns=20000, seed=1):
+    rng = random.Random(seed)
+    path = os.path.join(tempfile.mkdtemp(prefix="journal-"), "reader.jnl")
+    dev = CountingBlockDev(path)
+    journal = ReadingJournal(dev)
+    journal.replay()
+    assert sum(dev.block_erases) == 0, "formatting a blank region must not erase"
+
+    books = ["alice.txt", "a-rather-long-book-file-name-for-testing.txt", "charset.txt"]
+    model = {"book": None, "pages": {}, "marks": {}, "settings": {}}
+    totals = {"user": 0, "snap": 0, "bytes": 0, "compactions": 0}
+    naive_bytes = 0
+    boots = []
+
+    def check():
+        state = journal.state
+        assert state.book == model["book"], (state.book, model["book"])
+        if model["book"]:
+            assert state.page == model["pages"][model["book"]]
+            assert state.offset == model["pages"][model["book"]] * 731
+            assert state.bookmarks() == sorted(model["marks"].get(model["book"], ()))
+        assert state.settings == model["settings"]
+
+    for turn in range(turns):
+        op = rng.random()
+        if model["book"] is None or op < 0.002:
+            book = rng.choice(books)
+            journal.open_book(book)
+            model["book"] = book
+            model["pages"].setdefault(book, 0)
+        elif op < 0.004:
+            page = model["pages"][model["book"]]
+            if rng.random() < 0.7:
+                journal.add_bookmark(page)
+                model["marks"].setdefault(model["book"], set()).add(page)
+            else:
+                journal.remove_bookmark(page)
+                model["marks"].setdefault(model["book"], set()).discard(page)
+        elif op < 0.006:
+            value = rng.randrange(8)
+            journal.set_setting("font_size", value)
+            model["settings"]["font_size"] = value
+        else:
+            page = model["pages"][model["book"]] + 1
+            journal.set_page(page, page * 731)
+            model["pages"][model["book"]] = page
+        # what a per-change JSON rewrite of the whole state would write
+        naive_bytes += len(json.dumps({
+            "book": model["book"], "pages": model["pages"],
+            "marks": {k: sorted(v) for k, v in model["marks"].items()},
+            "settings": model["settings"]}))
+
+        if rng.random() < 0.001:
+            # power cut: drop the in-memory journal and recover from flash
+            totals["user"] += journal.user_records
+            totals["snap"] += journal.snapshot_records
+            totals["bytes"] += journal.bytes_programmed
+            totals["compactions"] += journal.compactions
+            if journal.slot < journal.slots and rng.random() < 0.5:
+                # torn write: part of the next record reached flash
+                dev.writeblocks(journal.head, bytes([0xA5]) + os.urandom(11),
+                                journal.slot * RECORD_SIZE)
+            journal = ReadingJournal(dev)
+            journal.replay()
+            boots.append((journal.boot_us, journal.boot_bytes_read, journal.boot_records))
+            check()
+
+    totals["user"] += journal.user_records
+    totals["snap"] += journal.snapshot_records
+    totals["bytes"] += journal.bytes_programmed
+    totals["compactions"] += journal.compactions
+    check()
+
+    journal = ReadingJournal(dev)
+    journal.replay()
+    check()
+    boots.append((journal.boot_us, journal.boot_bytes_read, journal.boot_records))
+
+    amplification = totals["bytes"] / (totals["user"] * RECORD_SIZE)
+    print(f"{turns} state changes, {len(boots)} replays, all recovered states match")
+    print(f"journal: {totals['user']} records + {totals['snap']} snapshot records "
+          f"({totals['compactions']} compactions), {totals['bytes']} bytes programmed, "
+          f"write amplification {amplification:.3f}")
+    print(f"erases: {sum(dev.block_erases)} total, per block "
+          f"min {min(dev.block_erases)} / max {max(dev.block_erases)}, "
+          f"{sum(dev.block_erases) / turns * 1000:.2f} per 1000 changes")
+    print(f"naive JSON rewrite: {naive_bytes} bytes of JSON, but at least one "
+          f"{dev.block_size}-byte block program + erase per change "
+          f"({turns * dev.block_size} bytes, {turns} erases)")
+    us = [b[0] for b in boots]
+    print(f"boot replay: {boots[-1][1]} bytes read, {boots[-1][2]} records, "
+          f"host mean {sum(us) / len(us):.0f}us / max {max(us)}us")
+
+
+if __name__ == "__main__":
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,151 @@
+import gc
+import time
+
+# 屏幕帧缓冲大小 (296x128, 1bpp)
+FRAME_BYTES = 296 * 128 // 8
+
+# 开机预分配的长期缓冲区: (名称, 字节数)
+DEFAULT_BUDGET = (
+    ("frame_bw", FRAME_BYTES),   # 黑白RAM (0x24)
+    ("frame_red", FRAME_BYTES),  # 红色RAM (0x26)
+    ("text", 2048),              # 当前页文本
+    ("io", 4096),                # 文件/网络读写块
+    ("scratch", 512),            # 临时缓冲
+)
+
+
+def fill(view, value):
+    """用单字节值填充缓冲区（倍增复制，不分配新缓冲）"""
+    n = len(view)
+    if n == 0:
+        return
+    view[0] = value
+    done = 1
+    while done < n:
+        step = min(done, n - done)
+        view[done:done + step] = view[:step]
+        done += step
+
+
+class MemoryArena:
+    def __init__(self, budget=DEFAULT_BUDGET):
+        """按预算一次性分配所有长期缓冲区"""
+        gc.collect()
+        self._boot_free = self._mem_free()
+
+        # 先分配一整块，再切成各个区域，避免堆上出现零散的小块
+        total = 0
+        for name, size in budget:
+            total += size
+        self._pool = bytearray(total)
+        pool = memoryview(self._pool)
+
+        self._views = {}
+        offset = 0
+        for name, size in budget:
+            self._views[name] = pool[offset:offset + size]
+            offset += size
+        self.total = total
+
+        # 诊断统计
+        self.peak_alloc = self._mem_alloc()
+        self.gc_count = 0
+        self.gc_last_us = 0
+        self.gc_max_us = 0
+        self.gc_total_us = 0
+        self._gc_paused = False
+        gc.collect()
+
+    @staticmethod
+    def _mem_free():
+        # 主机端的CPython没有mem_free/mem_alloc
+        f = getattr(gc, "mem_free", None)
+        return f() if f else 0
+
+    @staticmethod
+    def _mem_alloc():
+        f = getattr(gc, "mem_alloc", None)
+        return f() if f else 0
+
+    def view(self, name):
+        """获取预分配区域的memoryview"""
+        return self._views[name]
+
+    def scratch(self, n, name="scratch"):
+        """获取可复用的临时缓冲区（前n字节）"""
+        view = self._views[name]
+        if n > len(view):
+            raise ValueError(f"{name} 缓冲区不足: 需要 {n}, 只有 {len(view)}")
+        return view[:n]
+
+    def sample(self):
+        """记录当前堆占用峰值"""
+        used = self._mem_alloc()
+        if used > self.peak_alloc:
+            self.peak_alloc = used
+        return used
+
+    def pause_gc(self):
+        """帧传输期间暂停自动GC"""
+        gc.disable()
+        self._gc_paused = True
+
+    def resume_gc(self):
+        """恢复自动GC"""
+        if self._gc_paused:
+            gc.enable()
+            self._gc_paused = False
+
+    def collect(self):
+        """执行一次GC并记录耗时，适合在BUSY等待期间调用"""
+        self.sample()
+        start = time.ticks_us()
+        gc.collect()
+        elapsed = time.ticks_diff(time.ticks_us(), start)
+        self.gc_count += 1
+        self.gc_last_us = elapsed
+        self.gc_total_us += elapsed
+        if elapsed > self.gc_max_us:
+            self.gc_max_us = elapsed
+        return elapsed
+
+    def largest_free_block(self):
+        """二分查找当前可分配的最大连续块"""
+        low = 0
+        high = self._mem_free()
+        while low < high:
+            mid = (low + high + 1) // 2
+            try:
+                block = bytearray(mid)
+                del block
+                low = mid
+            except MemoryError:
+                high = mid - 1
+        return low
+
+    def diagnostics(self, verbose=True):
+        """汇报堆峰值、碎片率和GC暂停时间"""
+        self.collect()
+        free = self._mem_free()
+        largest = self.largest_free_block() if free else 0
+        frag = 1 - largest / free if free else 0.0
+        info = {
+            "arena_bytes": self.total,
+            "boot_free": self._boot_free,
+            "heap_free": free,
+            "heap_alloc": self._mem_alloc(),
+            "peak_alloc": self.peak_alloc,
+            "largest_free": largest,
+            "fragmentation": frag,
+            "gc_count": self.gc_count,
+            "gc_last_us": self.gc_last_us,
+            "gc_max_us": self.gc_max_us,
+            "gc_avg_us": self.gc_total_us // self.gc_count if self.gc_count else 0,
+        }
+        if verbose:
+            print("=== 内存诊断 ===")
+            print(f"预分配区: {info['arena_bytes']} 字节")
+            print(f"堆空闲: {info['heap_free']} / 峰值占用: {info['peak_alloc']}")
+            print(f"最大连续块: {info['largest_free']} (碎片率 {frag * 100:.1f}%)")
+            print(f"GC次数: {info['gc_count']}, 最长 {info['gc_max_us']}us, 平均 {info['gc_avg_us']}us")
+        return info
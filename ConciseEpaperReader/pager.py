@@ -0,0 +1,206 @@
+from memarena import fill
+
+# 5x7 ASCII点阵字体 (0x20-0x7E)，每字符5列，每列低位在上
+FONT = bytes.fromhex(
+    "0000000000" "00005f0000" "0007000700" "147f147f14"  #  !"#
+    "242a7f2a12" "2313086462" "3649552250" "0005030000"  # $%&'
+    "001c224100" "0041221c00" "14083e0814" "08083e0808"  # ()*+
+    "0050300000" "0808080808" "0060600000" "2010080402"  # ,-./
+    "3e5149453e" "00427f4000" "4261514946" "2141454b31"  # 0123
+    "1814127f10" "2745454539" "3c4a494930" "0171090503"  # 4567
+    "3649494936" "064949291e" "0036360000" "0056360000"  # 89:;
+    "0814224100" "1414141414" "0041221408" "0201510906"  # <=>?
+    "324979413e" "7e1111117e" "7f49494936" "3e41414122"  # @ABC
+    "7f4141221c" "7f49494941" "7f09090101" "3e41415132"  # DEFG
+    "7f0808087f" "00417f4100" "2040413f01" "7f08142241"  # HIJK
+    "7f40404040" "7f0204027f" "7f0408107f" "3e4141413e"  # LMNO
+    "7f09090906" "3e4151215e" "7f09192946" "4649494931"  # PQRS
+    "01017f0101" "3f4040403f" "1f2040201f" "7f2018207f"  # TUVW
+    "6314081463" "0304780403" "6151494543" "007f414100"  # XYZ[
+    "0204081020" "0041417f00" "0402010204" "4040404040"  # \]^_
+    "0001020400" "2054545478" "7f48444438" "3844444420"  # `abc
+    "384444487f" "3854545418" "087e090102" "081454543c"  # defg
+    "7f08040478" "00447d4000" "2040443d00" "007f102844"  # hijk
+    "00417f4000" "7c04180478" "7c08040478" "3844444438"  # lmno
+    "7c14141408" "081414187c" "7c08040408" "4854545420"  # pqrs
+    "043f444020" "3c4040207c" "1c2040201c" "3c4030403c"  # tuvw
+    "4428102844" "0c5050503c" "4464544c44" "0008364100"  # xyz{
+    "00007f0000" "0041360800" "0804081008"               # |}~
+)
+
+CHAR_W = 6      # 字符宽度（含1列间距）
+LINE_H = 8      # 行高
+COLS = 296 // CHAR_W
+ROWS = 128 // LINE_H
+ROW_BYTES = 128 // 8
+
+
+def _prepare_columns():
+    """把字体列转换成屏幕RAM字节：位翻转（第一个像素在最高位），并反色（1为白）"""
+    out = bytearray(len(FONT))
+    for i, col in enumerate(FONT):
+        rev = 0
+        for bit in range(8):
+            if col & (1 << bit):
+                rev |= 0x80 >> bit
+        out[i] = ~rev & 0xFF
+    return bytes(out)
+
+
+_COLUMNS = _prepare_columns()
+_UNKNOWN = (ord("?") - 0x20) * 5
+
+
+def draw_text(frame, text, col=0, row=0):
+    """
+    在帧缓冲中绘制一行文字（按字符格定位）
+    帧缓冲为控制器RAM布局: 296行 x 16字节，横屏x对应RAM行，横屏y对应行内的位
+    """
+    if row >= ROWS:
+        return
+    for ch in text:
+        if col >= COLS:
+            break
+        code = ord(ch)
+        glyph = (code - 0x20) * 5 if 0x20 <= code < 0x7F else _UNKNOWN
+        base = col * CHAR_W * ROW_BYTES + row
+        for i in range(5):
+            frame[base + i * ROW_BYTES] = _COLUMNS[glyph + i]
+        col += 1
+
+
+def _is_break(ch):
+    return ch.isspace() and ch != "\n"
+
+
+def layout(text, rows=ROWS - 1, cols=COLS, final=True):
+    """
+    排版一页，返回 (行列表, 消耗的字符数)
+    按单词折行，超长单词强制断开，页首的空行跳过；
+    final为False时文本之后还有内容，末尾可能不完整的单词和行留给下一页
+    """
+    lines = []
+    line = ""
+    line_start = 0   # 当前行第一个字符的位置
+    consumed = 0
+    i = 0
+    n = len(text)
+    while len(lines) < rows:
+        while i < n and _is_break(text[i]):
+            i += 1
+        if i >= n:
+            if final:
+                if line:
+                    lines.append(line)
+                consumed = n
+            elif line and not lines:
+                # 缓冲区里只有一行（如超长的空白），先输出这一行，保证前进
+                lines.append(line)
+                consumed = i
+            else:
+                consumed = line_start if line else i
+            return lines, consumed
+        if text[i] == "\n":
+            # 段落结束；页首的空行没有意义
+            if line or lines:
+                lines.append(line)
+            line = ""
+            i += 1
+            consumed = i
+            continue
+
+        j = i
+        while j < n and not text[j].isspace():
+            j += 1
+        partial = j >= n and not final
+        # 超长单词强制断开
+        while j - i > cols and len(lines) < rows:
+            if line:
+                lines.append(line)
+                line = ""
+                consumed = i
+                continue
+            lines.append(text[i:i + cols])
+            i += cols
+            consumed = i
+        if len(lines) >= rows:
+            break
+        if partial:
+            if line and not lines:
+                lines.append(line)
+                return lines, i
+            return lines, line_start if line else i
+        word = text[i:j]
+        if not line:
+            line = word
+            line_start = i
+        elif len(line) + 1 + len(word) <= cols:
+            line += " " + word
+        else:
+            lines.append(line)
+            consumed = i
+            if len(lines) >= rows:
+                break
+            line = word
+            line_start = i
+        i = j
+    return lines, consumed
+
+
+def paginate(text, rows=ROWS - 1, cols=COLS):
+    """把整段文本分页（仅适合小文本，书籍请用read_page逐页读取）"""
+    pages = []
+    while True:
+        lines, used = layout(text, rows, cols)
+        if lines or not pages:
+            pages.append(lines)
+        text = text[used:]
+        if not text:
+            return pages
+        if not used:
+            return pages
+
+
+def _decode(buf):
+    try:
+        return bytes(buf).decode()
+    except UnicodeError:
+        # 非UTF-8文件：非ASCII字节按"?"显示，保证字符数和字节数一致
+        return bytes(b if b < 0x80 else 0x3F for b in buf).decode()
+
+
+def _utf8_end(buf, n):
+    """去掉末尾被截断的UTF-8多字节字符"""
+    i = n - 1
+    while i >= 0 and n - i <= 4 and buf[i] & 0xC0 == 0x80:
+        i -= 1
+    if i < 0 or buf[i] < 0xC0:
+        return n
+    need = 2 if buf[i] < 0xE0 else 3 if buf[i] < 0xF0 else 4
+    return i if i + need > n else n
+
+
+def read_page(f, offset, buf, rows=ROWS - 1, cols=COLS):
+    """
+    从文件的字节偏移处读取并排版一页，返回 (行列表, 下一页偏移)
+    只读取buf大小的内容（使用arena的text缓冲区），不需要把整本书读进内存
+    """
+    f.seek(offset)
+    n = f.readinto(buf) or 0
+    final = n < len(buf)
+    end = n if final else _utf8_end(buf, n)
+    text = _decode(buf[:end])
+    lines, used = layout(text, rows, cols, final and end == n)
+    if not used and end:
+        # 一个字都没排下时按文件末尾处理，翻页总能前进
+        lines, used = layout(text, rows, cols)
+    return lines, offset + len(text[:used].encode())
+
+
+def render_page(frame, lines, footer=None):
+    """把一页文字绘制到帧缓冲（白底黑字）"""
+    fill(frame, 0xFF)
+    for row, line in enumerate(lines):
+        draw_text(frame, line, 0, row)
+    if footer:
+        draw_text(frame, footer, COLS - len(footer), ROWS - 1)
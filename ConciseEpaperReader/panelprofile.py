@@ -0,0 +1,25 @@
+import json
+
+# 屏幕配置文件，保存校准结果（只影响SPI波特率，屏幕尺寸固定为296x128）
+PROFILE_PATH = "panel.json"
+
+DEFAULTS = {
+    "baudrate": 4000000,
+}
+
+
+def load(path=PROFILE_PATH):
+    """读取屏幕配置，缺失的项使用默认值"""
+    profile = dict(DEFAULTS)
+    try:
+        with open(path) as f:
+            profile.update(json.load(f))
+    except (OSError, ValueError):
+        pass
+    return profile
+
+
+def save(profile, path=PROFILE_PATH):
+    """保存屏幕配置"""
+    with open(path, "w") as f:
+        json.dump(profile, f)
@@ -0,0 +1,168 @@
+"""
+Headless render farm with golden-image visual regression (run on Linux).
+
+    python3 renderfarm.py [--library DIR] [--golden DIR] [--jobs N] [--update]
+
+Every page of every .txt book in the library is rendered through
+EPDDriver.show_page on top of the fake `machine` backend, using the same
+streaming pagination (byte offset + arena text buffer) as the device.  The bytes
+written to controller RAM with 0x24 (black/white) and 0x26 (red) are
+captured and compared pixel-exactly with the golden images, which are
+stored as binary PBM files (P4, packed 1 bpp): 128 x 592, the 0x24 plane
+on top of the 0x26 plane, black = pixel set.  --update rewrites the
+golden set from the current run.
+"""
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+
+import fakemachine
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RAM_W = 128
+RAM_H = 296
+PLANE_BYTES = RAM_W * RAM_H // 8
+
+_driver = None
+
+
+def _worker_init():
+    global _driver
+    fakemachine.install()
+    from epapertest2 import EPDDriver
+    _driver = EPDDriver()
+
+
+def page_offsets(path):
+    """Byte offset of every page, found the way the device turns pages."""
+    fakemachine.install()
+    import pager
+    from memarena import DEFAULT_BUDGET
+    buf = bytearray(dict(DEFAULT_BUDGET)["text"])
+    size = os.path.getsize(path)
+    offsets = [0]
+    with open(path, "rb") as f:
+        while True:
+            _, offset = pager.read_page(f, offsets[-1], buf)
+            if offset <= offsets[-1]:
+                raise RuntimeError(f"{path}: page turn stuck at byte {offset}")
+            if offset >= size:
+                return offsets
+            offsets.append(offset)
+
+
+def render(task):
+    """Render one page; returns (book, page, 0x24 plane, 0x26 plane, seconds, spi bytes)."""
+    path, page, offset = task
+    if _driver.book != os.path.basename(path):
+        _driver.books_dir = os.path.dirname(path)
+        _driver.open_book(os.path.basename(path))
+    fakemachine.reset()
+    _driver.spi.bytes_written = 0
+    start = time.perf_counter()
+    _driver.show_page(page, offset)
+    elapsed = time.perf_counter() - start
+    ram = fakemachine.decode_ram()
+    book = os.path.splitext(os.path.basename(path))[0]
+    return (book, page, bytes(ram.get(0x24, b"")), bytes(ram.get(0x26, b"")),
+            elapsed, _driver.spi.bytes_written)
+
+
+def to_pbm(black, red):
+    # Controller RAM uses 1 for white / no red; PBM uses 1 for black.
+    # The red plane is stored as-is so a set pixel means red.
+    body = bytes(~b & 0xFF for b in black) + bytes(red)
+    return b"P4\n%d %d\n" % (RAM_W, 2 * RAM_H) + body
+
+
+def read_pbm(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    # the body is the last two planes; the header is only informative
+    return data[-2 * PLANE_BYTES:]
+
+
+def diff_pixels(a, b):
+    if len(a) != len(b):
+        return max(len(a), len(b)) * 8
+    return sum(bin(x ^ y).count("1") for x, y in zip(a, b))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--library", default=os.path.join(HERE, "library"))
+    parser.add_argument("--golden", default=os.path.join(HERE, "golden"))
+    parser.add_argument("--jobs", type=int, default=os.cpu_count())
+    parser.add_argument("--update", action="store_true")
+    args = parser.parse_args(argv)
+
+    books = sorted(os.path.join(args.library, name)
+                   for name in os.listdir(args.library) if name.endswith(".txt"))
+    tasks = [(path, page, offset) for path in books
+             for page, offset in enumerate(page_offsets(path))]
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(args.jobs, initializer=_worker_init) as pool:
+        results = pool.map(render, tasks)
+    wall = time.perf_counter() - start
+
+    changed = []
+    missing = []
+    seen = set()
+    for book, page, black, red, elapsed, spi_bytes in results:
+        golden = os.path.join(args.golden, book, f"{page + 1:04d}.pbm")
+        seen.add(golden)
+        image = to_pbm(black, red)
+        if args.update:
+            os.makedirs(os.path.dirname(golden), exist_ok=True)
+            with open(golden, "wb") as f:
+                f.write(image)
+            continue
+        if not os.path.exists(golden):
+            missing.append(golden)
+            continue
+        delta = diff_pixels(read_pbm(golden), image[-2 * PLANE_BYTES:])
+        if delta:
+            changed.append((book, page + 1, delta))
+
+    stale = []
+    if os.path.isdir(args.golden):
+        for book in sorted(os.listdir(args.golden)):
+            if not os.path.isdir(os.path.join(args.golden, book)):
+                continue
+            for name in sorted(os.listdir(os.path.join(args.golden, book))):
+                path = os.path.join(args.golden, book, name)
+                if path not in seen:
+                    stale.append(path)
+    if args.update:
+        for path in stale:
+            os.remove(path)
+
+    print(f"{'book':<16}{'page':>6}{'render ms':>12}{'spi bytes':>12}")
+    for book, page, black, red, elapsed, spi_bytes in results:
+        print(f"{book:<16}{page + 1:>6}{elapsed * 1000:>12.2f}{spi_bytes:>12}")
+    costs = [r[4] for r in results]
+    print(f"\n{len(results)} pages from {len(books)} books in {wall:.2f}s "
+          f"with {args.jobs} workers; render mean {sum(costs) / len(costs) * 1000:.2f} ms, "
+          f"max {max(costs) * 1000:.2f} ms")
+
+    if args.update:
+        print(f"golden images updated in {args.golden} ({len(stale)} stale removed)")
+        return 0
+    for book, page, delta in changed:
+        print(f"CHANGED {book} page {page}: {delta} pixels differ")
+    for path in missing:
+        print(f"MISSING golden {path}")
+    for path in stale:
+        print(f"STALE golden {path} (page no longer rendered)")
+    if changed or missing or stale:
+        print(f"FAIL: {len(changed)} changed, {len(missing)} missing, {len(stale)} stale")
+        return 1
+    print("OK: all pages match golden images")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
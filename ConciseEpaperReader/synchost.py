@@ -0,0 +1,207 @@
+"""
+Host-side stand-in for the book server (run on Linux with CPython).
+
+    python3 synchost.py serve <library_dir> [port] [bind_address]
+    python3 synchost.py bench [size_mb]
+
+`serve` exposes <library_dir> with HTTP Range support and a generated
+/index.txt on all interfaces (0.0.0.0 unless bind_address is given), so
+the Pico W can reach it over the LAN; `bench` keeps its server on
+loopback.  `bench` downloads a random multi-megabyte book through
+BookSync, cuts the connection part way to exercise resume, and reports
+throughput, peak RAM and the longest single step() call.  It then checks
+that a wrong checksum and an unsafe book name make run() return False.
+"""
+import os
+import re
+import sys
+import time
+import shutil
+import zlib
+import tempfile
+import threading
+import tracemalloc
+import multiprocessing
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import fakemachine
+fakemachine.install()
+
+from booksync import BookSync
+
+
+def build_index(root):
+    lines = []
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name)
+        if not os.path.isfile(path) or name.startswith("."):
+            continue
+        crc = 0
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(65536), b""):
+                crc = zlib.crc32(block, crc)
+        lines.append(f"{name} {os.path.getsize(path)} {crc:08x}\n")
+    return "".join(lines).encode()
+
+
+class RangeHandler(SimpleHTTPRequestHandler):
+    # Set to a byte count to drop the connection after sending that much
+    # of the next file (once), simulating a flaky Wi-Fi link.
+    drop_after = None
+    # Replaces the generated index when set (for failure checks).
+    index = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path == "/index.txt":
+            body = RangeHandler.index or build_index(self.directory)
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        size = os.path.getsize(path)
+        first, last = 0, size - 1
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match:
+            first = int(match.group(1))
+            if match.group(2):
+                last = min(int(match.group(2)), size - 1)
+            if first > last:
+                self.send_error(416)
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {first}-{last}/{size}")
+        else:
+            self.send_response(200)
+        length = last - first + 1
+        self.send_header("Content-Length", str(length))
+        self.end_headers()
+
+        limit = length
+        if RangeHandler.drop_after is not None:
+            limit = min(length, RangeHandler.drop_after)
+            RangeHandler.drop_after = None
+        with open(path, "rb") as f:
+            f.seek(first)
+            while limit > 0:
+                block = f.read(min(65536, limit))
+                if not block:
+                    break
+                self.wfile.write(block)
+                limit -= len(block)
+
+
+def serve(root, port=8000, host="127.0.0.1"):
+    handler = lambda *args, **kwargs: RangeHandler(*args, directory=root, **kwargs)
+    server = ThreadingHTTPServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def _serve_process(root, drop_after, ports):
+    RangeHandler.drop_after = drop_after
+    server = serve(root, 0)
+    ports.put(server.server_address[1])
+    threading.Event().wait()
+
+
+def bench(size_mb=4):
+    work = tempfile.mkdtemp(prefix="booksync-")
+    library = os.path.join(work, "library")
+    dest = os.path.join(work, "books")
+    os.mkdir(library)
+    size = int(size_mb * 1024 * 1024)
+    with open(os.path.join(library, "book.bin"), "wb") as f:
+        f.write(os.urandom(size))
+
+    # The server runs in its own process so tracemalloc only sees the client.
+    # Its first file transfer drops after ~40%, then the client gives up.
+    ports = multiprocessing.Queue()
+    server = multiprocessing.Process(
+        target=_serve_process, args=(library, size * 2 // 5 + 123, ports), daemon=True)
+    server.start()
+    port = ports.get()
+    try:
+        sync = BookSync("127.0.0.1", port, dest)
+        sync.start()
+        while sync.step() and sync.retries == 0:
+            pass
+        sync.close()
+        partial = os.path.getsize(os.path.join(dest, "book.bin.part"))
+        print(f"interrupted at {partial} / {size} bytes")
+
+        # Second attempt resumes from the .part file, one step() at a time.
+        tracemalloc.start()
+        start = time.perf_counter()
+        sync = BookSync("127.0.0.1", port, dest)
+        sync.start()
+        longest = 0
+        while True:
+            t = time.perf_counter()
+            more = sync.step()
+            longest = max(longest, time.perf_counter() - t)
+            if not more:
+                break
+        ok = not sync.failed
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        with open(os.path.join(library, "book.bin"), "rb") as a, \
+                open(os.path.join(dest, "book.bin"), "rb") as b:
+            identical = a.read() == b.read()
+        print(f"resumed transfer: {sync.bytes_received} bytes in {elapsed:.3f}s "
+              f"({sync.bytes_received / elapsed / 1024 / 1024:.1f} MiB/s)")
+        print(f"peak RAM (tracemalloc): {peak / 1024:.1f} KiB")
+        print(f"longest step(): {longest * 1000:.1f} ms (budget {sync.step_ms} ms)")
+        print(f"sync ok: {ok}, file identical: {identical}")
+    finally:
+        server.terminate()
+        shutil.rmtree(work)
+
+    check_failures()
+
+
+def check_failures():
+    work = tempfile.mkdtemp(prefix="booksync-")
+    library = os.path.join(work, "library")
+    os.mkdir(library)
+    with open(os.path.join(library, "small.txt"), "wb") as f:
+        f.write(b"hello " * 1000)
+    server = serve(library, 0)
+    port = server.server_address[1]
+    try:
+        RangeHandler.index = b"small.txt 6000 deadbeef\n"
+        sync = BookSync("127.0.0.1", port, os.path.join(work, "books"))
+        ok = sync.run()
+        print(f"wrong crc: run() -> {ok}, failed {sync.failed}")
+
+        RangeHandler.index = b"../main.py 6000 00000000\n"
+        sync = BookSync("127.0.0.1", port, os.path.join(work, "books"))
+        ok = sync.run()
+        escaped = os.path.exists(os.path.join(work, "main.py"))
+        print(f"unsafe name: run() -> {ok}, failed {sync.failed}, written outside books: {escaped}")
+    finally:
+        RangeHandler.index = None
+        server.shutdown()
+        shutil.rmtree(work)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "serve":
+        port = int(sys.argv[3]) if len(sys.argv) > 3 else 8000
+        host = sys.argv[4] if len(sys.argv) > 4 else "0.0.0.0"
+        serve(sys.argv[2], port, host)
+        print(f"serving {sys.argv[2]} on {host}:{port}")
+        threading.Event().wait()
+    else:
+        bench(float(sys.argv[2]) if len(sys.argv) > 2 else 4)